@@ -12,14 +12,21 @@ $ ./server.py
 """
 
 import argparse
+import asyncio
+import collections
+import functools
 import json
 import logging
 import os
+import re
+import signal
+import socket
 import sys
-import time
+import threading
 import typing
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.StreamHandler())
@@ -27,48 +34,142 @@ logger.setLevel(logging.INFO)
 
 
 class CallsRegistry:
+    # Keep only the most recent calls so a long-running server does not
+    # grow without bound.
+    MAX_CALLS = 10000
+
     def __init__(self):
-        self.__registry: list[dict] = []
+        self._methods: collections.deque = collections.deque(maxlen=self.MAX_CALLS)
+        self._paths: collections.deque = collections.deque(maxlen=self.MAX_CALLS)
+        self._bodies: collections.deque = collections.deque(maxlen=self.MAX_CALLS)
+        self.__lock = threading.Lock()
+        self._dirty = False
+        self._cached_json = '[]'
 
     def add(self, method: str, path: str, body: typing.Optional[bytes]):
         if body is not None:
             body = body.decode()
 
-        self.__registry.append({
-            'method': method,
-            'path': path,
-            'body': body,
-        })
+        # Three appends instead of a dict allocation per call; the
+        # dicts are only materialized on demand in list().
+        with self.__lock:
+            self._methods.append(method)
+            self._paths.append(path)
+            self._bodies.append(body)
+            self._dirty = True
 
     def list(self) -> list[dict]:
-        return self.__registry
+        with self.__lock:
+            return [
+                {'method': method, 'path': path, 'body': body}
+                for method, path, body in zip(
+                    self._methods, self._paths, self._bodies
+                )
+            ]
+
+    def dump_json(self) -> str:
+        """Serialized call log, re-rendered only after a mutation.
+
+        GET /mocker is typically polled far more often than calls are
+        recorded, so caching the json.dumps output keeps repeated polls
+        off the serializer entirely.
+        """
+        with self.__lock:
+            if self._dirty:
+                self._cached_json = json.dumps([
+                    {'method': method, 'path': path, 'body': body}
+                    for method, path, body in zip(
+                        self._methods, self._paths, self._bodies
+                    )
+                ])
+                self._dirty = False
+            return self._cached_json
 
     def clear(self):
-        self.__registry = []
+        with self.__lock:
+            self._methods.clear()
+            self._paths.clear()
+            self._bodies.clear()
+            self._cached_json = '[]'
+            self._dirty = False
 
 
 REGISTRY = CallsRegistry()
 
+_PARAM_SEGMENT = re.compile(r"\{[^/{}]+\}")
+
+# The five supported verbs, interned so routing keys compare by
+# identity with the literals used in the do_* dispatch.
+_METHODS = {
+    method: sys.intern(method)
+    for method in ("GET", "POST", "PUT", "DELETE", "HEAD")
+}
+
+_JSON_HEADERS = [{"Content-Type": "application/json"}]
+
+
+def _serialize_frame(response_code, headers, body: bytes) -> bytes:
+    """Render status line, headers, Content-Length and body as one
+    bytes blob, so a response is a single wfile.write()."""
+    try:
+        phrase = HTTPStatus(response_code).phrase
+    except ValueError:
+        phrase = ""
+
+    lines = [f"HTTP/1.1 {response_code} {phrase}"]
+    for name, value in headers:
+        lines.append(f"{name}: {value}")
+    lines.append(f"Content-Length: {len(body)}")
+
+    return "\r\n".join(lines).encode("utf-8") + b"\r\n\r\n" + body
+
+
+@functools.lru_cache(maxsize=128)
+def _read_file(filename, mtime_ns):
+    """Read a mock body file, cached per (filename, mtime).
+
+    The mtime in the key means an edited file is re-read on its next
+    request while unchanged files are served straight from memory.
+    """
+    with open(filename, "rb") as file:
+        return file.read()
+
+
+@functools.lru_cache(maxsize=1024)
+def _resolve(method, path, configuration):
+    """Resolve (method, path) to a configured response, or a 404.
+
+    Mock workloads hit the same few URLs over and over, so the result
+    is memoized; repeated hits cost a single cache probe. Misses are
+    memoized too (as prebuilt 404 responses, frame included), so a
+    storm of unknown paths allocates nothing after the first hit each.
+    """
+    response = configuration.routes.get((method, path))
+
+    if response is None and method in configuration.compiled:
+        matched = configuration.compiled[method].match(path)
+        if matched:
+            response = configuration.handlers[method][matched.lastindex - 1]
+
+    if response is None:
+        body = json.dumps({"message": f"path '{path}' not found"})
+        response = MockedResponse(method, path, 404, _JSON_HEADERS, body)
+
+    return response
+
 
 class Configuration:
     def __init__(self, hostname, port, responses):
         self.hostname = hostname
         self.port = port
-        self.head_response_map = {}
-        self.get_response_map = {}
-        self.post_response_map = {}
-        self.put_response_map = {}
-        self.delete_response_map = {}
+        self.routes = {}
+        self.compiled = {}
+        self.handlers = {}
         self._build_response_map(responses)
+        _resolve.cache_clear()
 
     def _build_response_map(self, responses):
-        response_map = {
-            "GET": self.get_response_map,
-            "POST": self.post_response_map,
-            "PUT": self.put_response_map,
-            "DELETE": self.delete_response_map,
-            "HEAD": self.head_response_map,
-        }
+        patterns = {}
 
         for response in responses:
             mocked_resp = MockedResponse(
@@ -80,8 +181,27 @@ class Configuration:
                 response.get("delay"),
             )
 
-            method_map = response_map[response.get("method").upper()]
-            method_map[response.get("path")] = mocked_resp
+            method = response.get("method").upper()
+            method = _METHODS.get(method, method)
+            path = response.get("path")
+
+            if _PARAM_SEGMENT.search(path):
+                patterns.setdefault(method, []).append(self._compile_path(path))
+                self.handlers.setdefault(method, []).append(mocked_resp)
+            else:
+                self.routes[(method, path)] = mocked_resp
+
+        # One alternation regex per method: matching happens in C and
+        # the group index recovers the response without a Python loop.
+        for method, method_patterns in patterns.items():
+            self.compiled[method] = re.compile("|".join(method_patterns))
+
+    @staticmethod
+    def _compile_path(path):
+        pattern = "[^/]+".join(
+            re.escape(part) for part in _PARAM_SEGMENT.split(path)
+        )
+        return f"(^{pattern}$)"
 
 
 class Response:
@@ -97,9 +217,10 @@ class Response:
         self.method = method if method else "GET"
         self.path = path if path else "/"
         self.response_code = response_code or 200
-        self.headers = headers or []
+        self.headers = self._normalize_headers(headers)
         self.delay = delay or 0
         self.body = self.body_wrapper_cls()(body)
+        self.frame = None
 
     def __repr__(self):
         return self.__str__()
@@ -107,6 +228,16 @@ class Response:
     def body_wrapper_cls(self):
         raise NotImplementedError
 
+    @staticmethod
+    def _normalize_headers(headers) -> tuple:
+        """Flatten the config's list of single-key dicts to (name, value)
+        pairs once, so sending never has to unpack dicts per request."""
+        return tuple(
+            (name, value)
+            for header in (headers or [])
+            for name, value in header.items()
+        )
+
 
 class MockerResponse(Response):
     class Body:
@@ -126,123 +257,244 @@ class MockerResponse(Response):
         return self.Body
 
 
+# Responses are stateless once built, so the fixed ones are shared.
+_MOCKER_CLEARED = MockerResponse('DELETE', '/mocker', 204, {}, '')
+
+
 class MockedResponse(Response):
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # File-backed bodies may change on disk, so their frames cannot
+        # be frozen at build time; they go through the generic path.
+        self.frame = None if self.body.is_file else self._build_frame()
+
     def body_wrapper_cls(self):
         return self.MockedResponseBody
 
+    def _build_frame(self) -> bytes:
+        """Serialize the whole HTTP response once, at build time.
+
+        The handler can then answer a request with a single
+        wfile.write() instead of one write per status line and header.
+        """
+        return _serialize_frame(
+            self.response_code, self.headers, self.body.load()
+        )
+
     class MockedResponseBody:
         def __init__(self, content=None):
             self._file_definition = "@file://"
             self.content = content if content else ""
             self.is_file = self._file_definition in self.content
 
-        def load(self):
+            # String bodies are encoded once here; file bodies get an
+            # eager first read so missing files surface at startup.
             if self.is_file:
-                filename = self.content.replace(self._file_definition, "")
+                self.filename = self.content.replace(self._file_definition, "")
+                self._bytes = b""
                 try:
-                    with open(filename) as file:
-                        return file.read()
-                except:
+                    self._bytes = self._read_current()
+                except OSError as err:
                     logger.error(
-                        "File '%s' not found in filesystem.", filename
+                        "Unable to read file '%s': %s", self.filename, err
                     )
-                    return None
             else:
-                return self.content.encode('utf-8')
+                self.filename = None
+                self._bytes = self.content.encode('utf-8')
 
-        def __len__(self):
-            try:
-                filename = self.content.replace(self._file_definition, "")
-                length = os.stat(filename).st_size
-            except:
-                length = len("None")
+        def _read_current(self) -> bytes:
+            return _read_file(self.filename, os.stat(self.filename).st_mtime_ns)
 
-            return length if self.is_file else len(self.content)
+        def load(self):
+            if self.is_file:
+                try:
+                    self._bytes = self._read_current()
+                except OSError as err:
+                    logger.error(
+                        "Unable to read file '%s': %s", self.filename, err
+                    )
+            return self._bytes
+
+        def __len__(self):
+            return len(self._bytes)
 
         def __str__(self):
             return f"is_file = [{self.is_file}], content = [{self.content}]"
 
 
+def _mocker_response(method, path) -> Response:
+    match method:
+        case 'GET':
+            d = REGISTRY.dump_json()
+            return MockerResponse(method, path, 200, _JSON_HEADERS, d)
+        case 'DELETE':
+            REGISTRY.clear()
+            return _MOCKER_CLEARED
+        case _:
+            return MockerResponse(method, path, 500, {}, 'Unknown method')
+
+
+# Body of the generated do_* methods. BaseHTTPRequestHandler
+# dispatches by method name, so one such method is emitted per verb,
+# with the verb and the configuration baked in as constants instead of
+# being threaded through arguments and attribute lookups per request.
+_HANDLER_TEMPLATE = """\
+def do_{method}(self):
+    path = self.path
+
+    # Drain the request body before answering, whichever branch is
+    # taken: with keep-alive, unread body bytes left in rfile would be
+    # parsed as the start of the next request on the connection.
+    content = None
+    if content_length := int(self.headers.get('Content-Length') or 0):
+        content = self.rfile.read(content_length)
+    elif 'chunked' in (self.headers.get('Transfer-Encoding') or ''):
+        # Chunked framing is not parsed, so the connection cannot be
+        # reused once this request is answered.
+        self.close_connection = True
+
+    if path.startswith('/mocker'):
+        self.send(path, _mocker_response('{method}', path))
+        return
+
+    REGISTRY.add('{method}', path, content)
+    try:
+        response = _resolve('{method}', path, _CONFIG)
+    except Exception as err:
+        body = json.dumps({{"message": f"An error happened with path '{{path}}': {{err}}"}})
+        response = MockedResponse('{method}', path, 500, _JSON_HEADERS, body)
+
+    self.send(path, response)
+"""
+
+
 def SimpleHandlerFactory(configuration):
     class SimpleHandler(BaseHTTPRequestHandler):
-        response_map = {
-            "HEAD": configuration.head_response_map.get,
-            "GET": configuration.get_response_map.get,
-            "POST": configuration.post_response_map.get,
-            "PUT": configuration.put_response_map.get,
-            "DELETE": configuration.delete_response_map.get,
-        }
-
-        def do_HEAD(self):
-            response = self.retrieve_response(self.path, "HEAD")
-            self.send(self.path, response)
-
-        def do_GET(self):
-            response = self.retrieve_response(self.path, "GET")
-            self.send(self.path, response)
-
-        def do_POST(self):
-            response = self.retrieve_response(self.path, "POST")
-            self.send(self.path, response)
-
-        def do_DELETE(self):
-            response = self.retrieve_response(self.path, "DELETE")
-            self.send(self.path, response)
-
-        def do_PUT(self):
-            response = self.retrieve_response(self.path, "PUT")
-            self.send(self.path, response)
+        # Precompiled frames advertise HTTP/1.1, so the handler must
+        # speak it too (this also enables keep-alive).
+        protocol_version = "HTTP/1.1"
 
         def send(self, path, response: Response):
-            time.sleep(response.delay)
-
-            self.send_response(response.response_code)
-
-            for header in response.headers:
-                self.send_header(list(header.keys())[0], list(header.values())[0])
-            self.send_header("Content-length", str(len(response.body)))
-            self.end_headers()
-            self.wfile.write(response.body.load())
-
-        def retrieve_response(self, path, method) -> Response:
-
-            if path.startswith('/mocker'):
-                response: Response
-                match method:
-                    case 'GET':
-                        headers = [{"Content-Type": "application/json"}]
-                        d = json.dumps(REGISTRY.list())
-                        response = MockerResponse(method, path, 200, headers, d)
-                    case 'DELETE':
-                        REGISTRY.clear()
-                        response = MockerResponse(method, path, 204, {}, '')
-                    case _:
-                        response = MockerResponse(method, path, 500, {}, 'Unknown method')
-                return response
+            if response.delay:
+                # Event.wait releases the GIL for the whole delay, so
+                # other handler threads keep serving; undelayed mocks
+                # skip the timer call entirely.
+                threading.Event().wait(response.delay)
+
+            frame = response.frame
+            if frame is None:
+                # Dynamic responses (mocker, file-backed bodies) are
+                # framed at request time but still sent in one write.
+                frame = _serialize_frame(
+                    response.response_code,
+                    response.headers,
+                    response.body.load(),
+                )
+
+            if self.command == "HEAD":
+                # Headers only: Content-Length still advertises the
+                # body size, but writing the body would desync any
+                # keep-alive connection.
+                frame = frame[:frame.index(b"\r\n\r\n") + 4]
+
+            self.log_request(response.response_code)
+            self.wfile.write(frame)
+
+    namespace = {
+        "_CONFIG": configuration,
+        "_mocker_response": _mocker_response,
+        "_resolve": _resolve,
+        "REGISTRY": REGISTRY,
+        "MockedResponse": MockedResponse,
+        "_JSON_HEADERS": _JSON_HEADERS,
+        "json": json,
+    }
+    for method in _METHODS:
+        exec(_HANDLER_TEMPLATE.format(method=method), namespace)
+        setattr(SimpleHandler, f"do_{method}", namespace[f"do_{method}"])
 
-            else:
-                content = None
-                if self.headers.get('Content-Length') or 0 > 0:
-                    content = self.rfile.read(int(self.headers.get('Content-Length')))
+    return SimpleHandler
 
-                REGISTRY.add(path, method, content)
-                try:
-                    response = self.response_map.get(method)(path)
 
-                    if response is None:
-                        body = json.dumps({"message": f"path '{path}' not found"})
-                        headers = [{"Content-Type": "application/json"}]
-                        response = MockedResponse(method, path, 404, headers, body)
+def create_asgi_app(configuration):
+    """Build an ASGI application serving the same mocks as SimpleHandler.
 
-                except Exception as err:
-                    body = json.dumps({"message": f"An error happened with path '{path}': {err}"})
-                    headers = [{"Content-Type": "application/json"}]
-                    response = MockedResponse(method, path, 500, headers, body)
+    This lets the server run under a C-parser ASGI server when one is
+    installed (the stdlib handler parses HTTP line by line in Python):
 
-                return response
+        $ uvicorn --factory server:create_app
 
-    return SimpleHandler
+    It is plain stdlib code; nothing here imports uvicorn, so the
+    default `./server.py` entrypoint stays dependency-free.
+    """
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+
+        method = scope["method"]
+        path = scope["path"]
+
+        if path.startswith("/mocker"):
+            response = _mocker_response(method, path)
+        else:
+            body = b""
+            more_body = True
+            while more_body:
+                message = await receive()
+                body += message.get("body", b"")
+                more_body = message.get("more_body", False)
+
+            REGISTRY.add(method, path, body or None)
+            response = _resolve(method, path, configuration)
+
+        if response.delay:
+            await asyncio.sleep(response.delay)
+
+        content = response.body.load()
+        headers = [
+            (name.encode("utf-8"), value.encode("utf-8"))
+            for name, value in response.headers
+        ]
+        headers.append((b"content-length", str(len(content)).encode("utf-8")))
+
+        await send({
+            "type": "http.response.start",
+            "status": response.response_code,
+            "headers": headers,
+        })
+        await send({"type": "http.response.body", "body": content})
+
+    return app
+
+
+def create_app():
+    """ASGI factory: loads CONFIG_FILE (or config.json) and builds the app."""
+    configuration = load_configuration(os.environ.get("CONFIG_FILE"))
+    return create_asgi_app(configuration)
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    # Turned on by main() in multi-worker mode only. SO_REUSEPORT lets
+    # the workers bind the same port and have the kernel balance
+    # connections between them, but with a single worker it would also
+    # let a second instance bind silently and steal requests instead
+    # of failing with EADDRINUSE.
+    reuse_port = False
+
+    def server_bind(self):
+        if self.reuse_port and hasattr(socket, "SO_REUSEPORT"):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
 
 
 def load_configuration(config_file=None):
@@ -268,8 +520,41 @@ def load_configuration(config_file=None):
     return configuration
 
 
-def main(config):
-    httpd = HTTPServer(
+def main(config, workers=1):
+    if workers > 1 and not hasattr(os, "fork"):
+        logger.warning("Multiple workers need os.fork(); running with one.")
+        workers = 1
+
+    if workers > 1:
+        MockServer.reuse_port = True
+
+    # Fork the extra workers before binding; each process gets its own
+    # SO_REUSEPORT socket and the kernel spreads connections across
+    # them. Note that each worker keeps its own calls registry, so
+    # GET /mocker only reports the calls its worker served.
+    child_pids = []
+    for _ in range(workers - 1):
+        pid = os.fork()
+        if pid == 0:
+            child_pids = []
+            break
+        child_pids.append(pid)
+
+    if child_pids:
+        # The parent forwards termination to its workers so killing it
+        # doesn't leave orphans bound to the port.
+        def forward_signal(signum, _frame):
+            for child_pid in child_pids:
+                try:
+                    os.kill(child_pid, signum)
+                except ProcessLookupError:
+                    pass
+            raise KeyboardInterrupt
+
+        signal.signal(signal.SIGTERM, forward_signal)
+        signal.signal(signal.SIGINT, forward_signal)
+
+    httpd = MockServer(
         (config.hostname, config.port), SimpleHandlerFactory(config)
     )
 
@@ -281,6 +566,13 @@ def main(config):
         pass
 
     httpd.server_close()
+
+    for child_pid in child_pids:
+        try:
+            os.waitpid(child_pid, 0)
+        except ChildProcessError:
+            pass
+
     logger.info("Server Stops - %s:%s", config.hostname, config.port)
 
 
@@ -292,6 +584,8 @@ def get_opts():
     \tPORT
     \t  Sets the port the server will listen on. It's overwritten by the configuration file.
     \t  To use it, remove the key `port` from the configuration file.
+    \tWORKERS
+    \t  Sets the number of worker processes. It's overwritten by the --workers option.
 
     """
     parser = argparse.ArgumentParser(
@@ -305,6 +599,16 @@ def get_opts():
         help="Use custom JSON configuration file.",
         required=False,
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        metavar="workers",
+        type=int,
+        default=int(os.environ.get("WORKERS", "1")),
+        help="Number of worker processes sharing the port (each keeps "
+             "its own /mocker call log).",
+        required=False,
+    )
 
     return parser.parse_args()
 
@@ -312,4 +616,4 @@ def get_opts():
 if __name__ == "__main__":
     args = get_opts()
     config = load_configuration(args.file)
-    main(config)
+    main(config, args.workers)